@@ -0,0 +1,111 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+
+# On-disk cache for Claude responses and scraped pages, keyed by SHA-256.
+CACHE_PATH = os.path.join(".cache", "llm_cache.sqlite3")
+
+# Default time-to-live in seconds (one week).
+DEFAULT_TTL = 7 * 24 * 60 * 60
+
+_schema_lock = threading.Lock()
+_schema_ready = False
+
+def make_key(*parts):
+    """
+    Build a cache key from the given parts (e.g. model and prompt, or a URL)
+    by hashing them with SHA-256.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def _ensure_schema():
+    """
+    Create the cache directory and table the first time the cache is used,
+    and drop any rows that expired since the last run.
+    """
+    global _schema_ready
+    with _schema_lock:
+        if _schema_ready:
+            return
+        os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+        conn = sqlite3.connect(CACHE_PATH, timeout=30)
+        try:
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS cache ("
+                    "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+                )
+                conn.execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),))
+        finally:
+            conn.close()
+        _schema_ready = True
+
+def _connect():
+    """
+    Open a connection to the cache database.
+    A fresh connection is used per operation so the cache is safe to use
+    from worker threads.
+    """
+    _ensure_schema()
+    return sqlite3.connect(CACHE_PATH, timeout=30)
+
+def get(key):
+    """
+    Return the cached value for key, or None if it is missing or expired.
+    """
+    try:
+        conn = _connect()
+        try:
+            row = conn.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and row[1] < time.time():
+                with conn:
+                    conn.execute("DELETE FROM cache WHERE key = ? AND expires_at < ?", (key, time.time()))
+                row = None
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"Error reading cache: {e}")
+        return None
+    if row is None:
+        return None
+    return json.loads(row[0])
+
+def set(key, value, ttl=DEFAULT_TTL):
+    """
+    Store a JSON-serializable value under key for ttl seconds.
+    """
+    try:
+        conn = _connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), time.time() + ttl)
+                )
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"Error writing cache: {e}")
+
+def delete(key):
+    """
+    Remove key from the cache if present.
+    """
+    try:
+        conn = _connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"Error deleting from cache: {e}")
@@ -1,8 +1,17 @@
 import os
+import ssl
+import json
+import asyncio
+import multiprocessing
+import aiohttp
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import orjson
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 from googlesearch import search
-import time
+import llm_cache
+from scrape_limiter import AdaptiveLimiter
 import sys
 
 # Load the Claude API key from the environment variable.
@@ -10,143 +19,371 @@ CLAUDE_API_KEY = os.environ.get("CLAUDE_API")
 if not CLAUDE_API_KEY:
     raise Exception("CLAUDE_API key not set in environment variable 'CLAUDE_API'.")
 
-def scrape_page(url, selector=None):
+# Optional Serper (Google Search JSON API) key. Without it we fall back to
+# scraping Google's result page with googlesearch, which is slower and rate-limited.
+SERPER_API_KEY = os.environ.get("SERPER_API")
+SERPER_API_URL = "https://google.serper.dev/search"
+
+# Google rate-limits scraped result pages, so without a Serper key searches are
+# run one at a time with this many seconds between them.
+GOOGLESEARCH_INTERVAL = 4
+
+# The scrape connector skips certificate checks, so API calls carrying a key
+# pass their own verifying context.
+API_SSL_CONTEXT = ssl.create_default_context()
+
+CLAUDE_API_URL = "https://api.anthropic.com/v1/messages"
+CLAUDE_MODEL = "claude-3-5-sonnet-latest"
+
+# Number of search queries generated for each section.
+QUERIES_PER_SECTION = 3
+
+# Maximum length of each section in the final paper.
+SECTION_CHAR_LIMIT = 50000
+
+# Scraped pages change more often than Claude output, so they expire after a day.
+SCRAPE_CACHE_TTL = 24 * 60 * 60
+
+# Finished sections are saved in llm_cache, per research prompt, so a rerun
+# after a crash can skip the sections that already completed. They are cleared
+# once the paper has been written in full.
+SECTION_CACHE_TTL = 24 * 60 * 60
+
+# Placeholder returned by combined_scrape_async when a query yields nothing usable.
+NO_CONTENT_TEXT = "No content found.\n\n"
+
+# Share one keep-alive session across all Claude calls so the TLS connection
+# to api.anthropic.com is reused instead of rebuilt on every request.
+CLAUDE_SESSION = requests.Session()
+CLAUDE_SESSION.headers.update({
+    "Content-Type": "application/json",
+    "x-api-key": CLAUDE_API_KEY,
+    "anthropic-version": "2023-06-01"
+})
+
+# Static instruction bodies for the Claude prompts. They are sent as the first
+# content block and marked with cache_control so Anthropic can cache the prefix;
+# the per-call text always follows in a second block.
+SEARCH_QUERIES_INSTRUCTION = (
+    "For each research paper section listed below, generate 3 unique and distinct search queries to gather "
+    "diverse and detailed information on the topic. Each query should focus on a different angle or aspect "
+    "that would be useful for a comprehensive research paper. Return only a JSON object mapping each section "
+    "name to a list of its 3 queries, for example:\n"
+    '{"Introduction": ["query 1", "query 2", "query 3"], "Conclusion": ["query 1", "query 2", "query 3"]}'
+)
+FORMAT_INSTRUCTION = (
+    "Please transform the following text into a detailed, narrative summary in an academic style, "
+    "as if writing a section of a research paper. Do not simply produce bullet points; instead, "
+    "craft full sentences with coherent paragraphs, integrating the information into a descriptive "
+    "and formal narrative. Remove any HTML or formatting tags, and ensure the output is comprehensive "
+    "but no longer than {limit} characters."
+)
+LENGTH_LIMIT_INSTRUCTION = (
+    "Please rewrite and elaborate on the following text into a detailed, narrative summary in academic style "
+    "appropriate for a research paper. Ensure that the final output is no longer than {limit} characters. "
+    "Do not simply truncate the text; generate a cohesive and descriptive summary that captures the essence "
+    "of the original content in full paragraphs."
+)
+
+def _cached_prompt(instruction, text):
     """
-    Fetch the content of a URL and extract text.
+    Build a user message content list with the static instruction first (cacheable)
+    and the dynamic text second.
+    """
+    return [
+        {"type": "text", "text": instruction, "cache_control": {"type": "ephemeral"}},
+        {"type": "text", "text": text}
+    ]
+
+SCRAPE_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/90.0.4430.93 Safari/537.36"
+    ),
+    "Accept-Encoding": "gzip, deflate"
+}
+
+# Stop downloading a page after this many bytes; the article text we need is
+# almost always near the top, and some pages run to several megabytes.
+SCRAPE_MAX_BYTES = 512 * 1024
+SCRAPE_CHUNK_SIZE = 64 * 1024
+
+# Stop extracting text from a page once this many characters have been collected.
+SCRAPE_TEXT_LIMIT = 20000
+
+# Tags whose text is extracted when no CSS selector is given. The strainer lets
+# the parser skip building every other subtree of the page.
+_HEADING_TAGS = frozenset(("p", "h1", "h2", "h3", "h4", "h5", "h6"))
+_HEADING_STRAINER = SoupStrainer(_HEADING_TAGS)
+
+# Upper and lower bounds on concurrent page fetches. The limit shrinks towards
+# the minimum while the machine is under memory or CPU pressure.
+SCRAPE_CONCURRENCY = 20
+SCRAPE_MIN_CONCURRENCY = 2
+
+# HTML parsing is CPU-bound, so it runs in worker processes rather than threads
+# to get around the GIL. Workers must not be forked from this process once it has
+# asyncio and aiohttp threads running, so use forkserver where available, else spawn.
+PARSE_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+def _parse_html(html, selector=None):
+    """
+    Extract text from a raw (bytes) HTML document.
     If a CSS selector is provided, extract only matching elements;
     otherwise, extract text from paragraph and heading tags.
+    Extraction stops once SCRAPE_TEXT_LIMIT characters have been collected.
     """
+    # lxml is a C parser and detects the encoding from the raw bytes itself.
+    if selector:
+        elements = BeautifulSoup(html, "lxml").select(selector)
+    else:
+        soup = BeautifulSoup(html, "lxml", parse_only=_HEADING_STRAINER)
+        elements = soup.find_all(_HEADING_TAGS)
+    texts = []
+    append = texts.append
+    length = 0
+    for el in elements:
+        text = el.get_text(strip=True)
+        if text:
+            append(text)
+            length += len(text)
+            if length >= SCRAPE_TEXT_LIMIT:
+                break
+    return "\n".join(texts)
+
+async def _read_bounded(response):
+    """
+    Read a response body in chunks, stopping after SCRAPE_MAX_BYTES.
+    The connection is closed rather than drained if the body is cut short.
+    """
+    body = bytearray()
+    async for chunk in response.content.iter_chunked(SCRAPE_CHUNK_SIZE):
+        body.extend(chunk)
+        if len(body) >= SCRAPE_MAX_BYTES:
+            response.close()
+            break
+    return bytes(body)
+
+async def _fetch_page(session, limiter, parse_pool, url, selector=None):
+    """
+    Fetch the content of a URL with the shared aiohttp session and extract its text.
+    Parsing runs in parse_pool so it uses every core and the event loop stays free
+    for other fetches.
+    Results are cached on disk by URL and selector for SCRAPE_CACHE_TTL seconds.
+    A broken parse pool is re-raised rather than treated as an empty page,
+    since every later parse in the run would fail the same way.
+    """
+    cache_key = llm_cache.make_key("scrape", url, selector or "")
+    # sqlite can block on a locked database, so keep cache I/O off the event loop.
+    cached = await asyncio.to_thread(llm_cache.get, cache_key)
+    if cached is not None:
+        return cached
     try:
-        headers = {
-            "User-Agent": (
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/90.0.4430.93 Safari/537.36"
-            )
-        }
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, "html.parser")
-        if selector:
-            elements = soup.select(selector)
-        else:
-            elements = soup.find_all(['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
-        texts = [el.get_text(strip=True) for el in elements if el.get_text(strip=True)]
-        return "\n".join(texts)
+        async with limiter:
+            async with session.get(
+                url, headers=SCRAPE_HEADERS, timeout=aiohttp.ClientTimeout(total=10)
+            ) as response:
+                response.raise_for_status()
+                html = await _read_bounded(response)
+        loop = asyncio.get_running_loop()
+        text = await loop.run_in_executor(parse_pool, _parse_html, html, selector)
+        if text:
+            await asyncio.to_thread(llm_cache.set, cache_key, text, ttl=SCRAPE_CACHE_TTL)
+        return text
+    except BrokenProcessPool:
+        raise
     except Exception as e:
         print(f"Error scraping {url}: {e}")
         return ""
 
-def combined_scrape(query, num_urls=3, min_length=100, selector=None):
+async def scrape_page_async(session, limiter, parse_pool, url_cache, url, selector=None):
+    """
+    Return the text of a URL, fetching it at most once per run. Concurrent callers
+    asking for the same URL (and selector) share a single in-flight fetch through
+    url_cache, the per-run dict of (url, selector) -> fetch task.
+    """
+    key = (url, selector)
+    task = url_cache.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_fetch_page(session, limiter, parse_pool, url, selector=selector))
+        url_cache[key] = task
+    # Shield the shared fetch so one cancelled caller does not cancel it for the others.
+    return await asyncio.shield(task)
+
+async def search_urls(session, search_lock, query, num_results):
+    """
+    Search for a query and return up to num_results (url, snippet) pairs.
+    Uses the Serper JSON API when SERPER_API is set, otherwise googlesearch.
+    googlesearch calls are serialised on search_lock and spaced
+    GOOGLESEARCH_INTERVAL seconds apart; Serper searches run concurrently.
+    """
+    try:
+        if not SERPER_API_KEY:
+            async with search_lock:
+                loop = asyncio.get_running_loop()
+                # googlesearch is blocking, so keep it off the event loop.
+                urls = await loop.run_in_executor(None, lambda: list(search(query, num_results=num_results)))
+                # Hold the lock through the pause so the next search waits for it.
+                await asyncio.sleep(GOOGLESEARCH_INTERVAL)
+            return [(url, "") for url in urls]
+        async with session.post(
+            SERPER_API_URL, headers={"X-API-KEY": SERPER_API_KEY}, json={"q": query, "num": num_results},
+            timeout=aiohttp.ClientTimeout(total=10), ssl=API_SSL_CONTEXT
+        ) as response:
+            response.raise_for_status()
+            result = await response.json()
+        return [
+            (hit["link"], hit.get("snippet", ""))
+            for hit in result.get("organic", [])[:num_results] if hit.get("link")
+        ]
+    except Exception as e:
+        print(f"Error searching for '{query}': {e}")
+        return []
+
+async def combined_scrape_async(session, limiter, parse_pool, url_cache, search_lock, query, num_urls=3, min_length=100, selector=None):
     """
-    For a given query, use Google Search to obtain several URLs,
-    scrape each URL’s content (optionally via a CSS selector), and combine the texts.
-    Only include content longer than min_length.
+    For a given query, use the search API to obtain several URLs,
+    scrape all of them concurrently (optionally via a CSS selector), and combine the texts.
+    Only include content longer than min_length; otherwise fall back to the search snippet.
+    Returns a list of text fragments so the caller can join everything once.
     """
-    combined_text = ""
-    urls = []
-    for url in search(query, num_results=num_urls):
-        urls.append(url)
+    hits = await search_urls(session, search_lock, query, num_urls)
+    urls = [url for url, _ in hits]
     print(f"URLs found for query '{query}': {urls}")
-    for url in urls:
-        text = scrape_page(url, selector=selector)
+    texts = await asyncio.gather(*[scrape_page_async(session, limiter, parse_pool, url_cache, url, selector=selector) for url in urls])
+    parts = []
+    for (url, snippet), text in zip(hits, texts):
         if len(text) >= min_length:
-            combined_text += f"--- Content from {url} ---\n{text}\n\n"
+            parts.append(f"--- Content from {url} ---\n{text}\n\n")
+        elif snippet:
+            print(f"Not enough content from {url} (length={len(text)}), using search snippet.")
+            parts.append(f"--- Snippet from {url} ---\n{snippet}\n\n")
         else:
             print(f"Not enough content from {url} (length={len(text)}).")
-        time.sleep(1)
-    return combined_text if combined_text else "No content found."
+    return parts if parts else [NO_CONTENT_TEXT]
 
-def generate_search_queries(section, topic, api_key):
+def _extract_claude_text(result):
     """
-    Uses the Claude API to generate 3 distinct search queries for a section.
+    Return the text of a non-streaming Claude messages response.
     """
-    prompt = (
-        f"Generate 3 unique and distinct search queries to gather diverse and detailed information on {topic} "
-        f"for the research paper section '{section}'. Each query should focus on a different angle or aspect "
-        "that would be useful for a comprehensive research paper. Return each query on a separate line."
-    )
-    url = "https://api.anthropic.com/v1/messages"
-    headers = {
-        "Content-Type": "application/json",
-        "x-api-key": api_key,
-        "anthropic-version": "2023-06-01"
-    }
+    content = result.get("content", "")
+    if isinstance(content, str):
+        return content.strip()
+    return "\n".join(item.get("text", "") for item in content if isinstance(item, dict))
+
+def _stream_claude_text(payload, api_key, timeout, max_chars=None):
+    """
+    Send a streaming Claude request and accumulate the text deltas from its
+    server-sent events as they arrive. If max_chars is given, stop reading as
+    soon as the accumulated text exceeds it instead of waiting for the full reply.
+    Raises if the stream ends before message_stop (or the max_chars cut-off), so
+    a truncated reply is never mistaken for a complete one.
+    """
+    chunks = []
+    length = 0
+    finished = False
+    with CLAUDE_SESSION.post(
+        CLAUDE_API_URL, headers={"x-api-key": api_key}, json={**payload, "stream": True},
+        timeout=timeout, stream=True
+    ) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line.startswith(b"data:"):
+                continue
+            event = orjson.loads(line[len(b"data:"):])
+            event_type = event.get("type")
+            if event_type == "content_block_delta":
+                text = event.get("delta", {}).get("text", "")
+                chunks.append(text)
+                length += len(text)
+                if max_chars is not None and length > max_chars:
+                    finished = True
+                    break
+            elif event_type == "message_stop":
+                finished = True
+                break
+            elif event_type == "error":
+                raise Exception(event.get("error", {}).get("message", "Claude streaming error"))
+    if not finished:
+        raise Exception("Claude stream ended before message_stop")
+    return "".join(chunks)
+
+def generate_all_queries(topic, sections, api_key):
+    """
+    Uses a single Claude call to generate 3 distinct search queries for every section.
+    Returns a dict of section name to its list of queries; sections missing from the
+    response fall back to a plain "<topic> <section>" query.
+    """
+    section_lines = "\n".join(f"- {section}: {desc}" for section, desc in sections.items())
+    prompt = _cached_prompt(SEARCH_QUERIES_INSTRUCTION, f"Topic: {topic}\nSections:\n{section_lines}")
     payload = {
-        "model": "claude-3-5-sonnet-latest",
-        "max_tokens": 300,
+        "model": CLAUDE_MODEL,
+        "max_tokens": 1000,
         "messages": [
             {"role": "user", "content": prompt}
         ]
     }
+    fallback = {section: [f"{topic} {section}"] for section in sections}
+    cache_key = llm_cache.make_key(json.dumps(payload, sort_keys=True))
+    cached = llm_cache.get(cache_key)
+    if cached is not None:
+        return cached
     try:
-        response = requests.post(url, headers=headers, json=payload, timeout=15)
+        response = CLAUDE_SESSION.post(
+            CLAUDE_API_URL, headers={"x-api-key": api_key}, json=payload, timeout=30
+        )
         response.raise_for_status()
-        result = response.json()
-        content = ""
-        if "content" in result:
-            content_val = result["content"]
-            if isinstance(content_val, list):
-                content = "\n".join(item.get("text", "") for item in content_val if isinstance(item, dict))
-            elif isinstance(content_val, str):
-                content = content_val.strip()
-        elif "messages" in result and result["messages"]:
-            content_val = result["messages"][0].get("content", "")
-            if isinstance(content_val, list):
-                content = "\n".join(item.get("text", "") for item in content_val if isinstance(item, dict))
-            elif isinstance(content_val, str):
-                content = content_val.strip()
-        queries = [line.strip() for line in content.splitlines() if line.strip()]
-        print(f"Generated queries for '{section}': {queries}")
-        return queries
+        content = _extract_claude_text(orjson.loads(response.content))
+        # Tolerate any prose or code fences around the JSON object.
+        parsed = orjson.loads(content[content.index("{"):content.rindex("}") + 1])
+        all_queries = {}
+        complete = True
+        for section in sections:
+            value = parsed.get(section)
+            # Only a list of strings is usable; iterating a bare string would
+            # turn every character into its own query.
+            queries = []
+            if isinstance(value, list):
+                queries = [q.strip() for q in value if isinstance(q, str) and q.strip()][:QUERIES_PER_SECTION]
+            if not queries:
+                complete = False
+            all_queries[section] = queries or fallback[section]
+            print(f"Generated queries for '{section}': {all_queries[section]}")
+        # Don't cache a reply that needed fallbacks, so a rerun asks Claude again.
+        if complete:
+            llm_cache.set(cache_key, all_queries)
+        return all_queries
     except Exception as e:
-        print(f"Error generating search queries for {section}: {e}")
-        return [f"{topic} {section}"]
+        print(f"Error generating search queries: {e}")
+        return fallback
 
-def format_text_with_ai(text, api_key):
+def format_text_with_ai(text, limit, api_key):
     """
     Sends the provided text to the Claude API to remove HTML/formatting and combine
     the content into a detailed, descriptive narrative in academic style.
-    The prompt instructs Claude to produce a narrative summary appropriate for a research paper.
-    """
-    prompt = (
-        "Please transform the following text into a detailed, narrative summary in an academic style, "
-        "as if writing a section of a research paper. Do not simply produce bullet points; instead, "
-        "craft full sentences with coherent paragraphs, integrating the information into a descriptive "
-        "and formal narrative. Remove any HTML or formatting tags, and ensure the output is comprehensive.\n\n"
-        + text
-    )
-    url = "https://api.anthropic.com/v1/messages"
-    headers = {
-        "Content-Type": "application/json",
-        "x-api-key": api_key,
-        "anthropic-version": "2023-06-01"
-    }
+    The prompt instructs Claude to produce a narrative summary appropriate for a research paper
+    and to keep it within `limit` characters, so a separate length-limit call is rarely needed.
+    """
+    prompt = _cached_prompt(FORMAT_INSTRUCTION.format(limit=limit), text)
     payload = {
-        "model": "claude-3-5-sonnet-latest",
+        "model": CLAUDE_MODEL,
         "max_tokens": 1500,
         "messages": [
             {"role": "user", "content": prompt}
         ]
     }
+    cache_key = llm_cache.make_key(json.dumps(payload, sort_keys=True))
+    cached = llm_cache.get(cache_key)
+    if cached is not None:
+        return cached
     try:
-        response = requests.post(url, headers=headers, json=payload, timeout=20)
-        response.raise_for_status()
-        result = response.json()
-        formatted_text = ""
-        if "content" in result:
-            content_val = result["content"]
-            if isinstance(content_val, list):
-                formatted_text = " ".join(item.get("text", "") for item in content_val if isinstance(item, dict))
-            elif isinstance(content_val, str):
-                formatted_text = content_val.strip()
-        elif "messages" in result and result["messages"]:
-            content_val = result["messages"][0].get("content", "")
-            if isinstance(content_val, list):
-                formatted_text = " ".join(item.get("text", "") for item in content_val if isinstance(item, dict))
-            elif isinstance(content_val, str):
-                formatted_text = content_val.strip()
-        return formatted_text if formatted_text else text
+        # Stop reading once the limit is exceeded; ensure_length_limit rewrites it anyway.
+        formatted_text = _stream_claude_text(payload, api_key, timeout=20, max_chars=limit)
+        if not formatted_text:
+            return text
+        llm_cache.set(cache_key, formatted_text)
+        return formatted_text
     except Exception as e:
         print(f"Error during AI formatting: {e}")
         return text
@@ -158,49 +395,166 @@ def ensure_length_limit(text, limit, api_key):
     """
     if len(text) <= limit:
         return text
-    prompt = (
-        f"Please rewrite and elaborate on the following text into a detailed, narrative summary in academic style "
-        f"appropriate for a research paper. Ensure that the final output is no longer than {limit} characters. "
-        "Do not simply truncate the text; generate a cohesive and descriptive summary that captures the essence "
-        "of the original content in full paragraphs.\n\n" + text
-    )
-    url = "https://api.anthropic.com/v1/messages"
-    headers = {
-        "Content-Type": "application/json",
-        "x-api-key": api_key,
-        "anthropic-version": "2023-06-01"
-    }
+    prompt = _cached_prompt(LENGTH_LIMIT_INSTRUCTION.format(limit=limit), text)
     payload = {
-        "model": "claude-3-5-sonnet-latest",
+        "model": CLAUDE_MODEL,
         "max_tokens": 1500,
         "messages": [
             {"role": "user", "content": prompt}
         ]
     }
+    cache_key = llm_cache.make_key(json.dumps(payload, sort_keys=True))
+    cached = llm_cache.get(cache_key)
+    if cached is not None:
+        return cached
     try:
-        response = requests.post(url, headers=headers, json=payload, timeout=25)
-        response.raise_for_status()
-        result = response.json()
-        summarized_text = ""
-        if "content" in result:
-            content_val = result["content"]
-            if isinstance(content_val, list):
-                summarized_text = " ".join(item.get("text", "") for item in content_val if isinstance(item, dict))
-            elif isinstance(content_val, str):
-                summarized_text = content_val.strip()
-        elif "messages" in result and result["messages"]:
-            content_val = result["messages"][0].get("content", "")
-            if isinstance(content_val, list):
-                summarized_text = " ".join(item.get("text", "") for item in content_val if isinstance(item, dict))
-            elif isinstance(content_val, str):
-                summarized_text = content_val.strip()
+        summarized_text = _stream_claude_text(payload, api_key, timeout=25, max_chars=limit)
         if len(summarized_text) > limit:
             summarized_text = summarized_text[:limit] + " [Content truncated]"
+        llm_cache.set(cache_key, summarized_text)
         return summarized_text
     except Exception as e:
         print(f"Error during summarization for length limit: {e}")
         return text[:limit] + " [Content truncated]"
 
+async def generate_all_queries_async(topic, sections, api_key, semaphore):
+    """
+    Run generate_all_queries in a worker thread, bounded by the Claude semaphore.
+    """
+    async with semaphore:
+        return await asyncio.to_thread(generate_all_queries, topic, sections, api_key)
+
+async def format_text_with_ai_async(text, limit, api_key, semaphore):
+    """
+    Run format_text_with_ai in a worker thread, bounded by the Claude semaphore.
+    """
+    async with semaphore:
+        return await asyncio.to_thread(format_text_with_ai, text, limit, api_key)
+
+async def ensure_length_limit_async(text, limit, api_key, semaphore):
+    """
+    Run ensure_length_limit in a worker thread, bounded by the Claude semaphore.
+    """
+    async with semaphore:
+        return await asyncio.to_thread(ensure_length_limit, text, limit, api_key)
+
+def _section_cache_key(research_prompt, section):
+    """
+    Return the llm_cache key under which a finished section for this research prompt is saved.
+    """
+    return llm_cache.make_key("section", CLAUDE_MODEL, research_prompt, section)
+
+async def process_section(session, scrape_limiter, parse_pool, url_cache, search_lock, claude_semaphore,
+                          section, queries, research_prompt, queue):
+    """
+    Scrape all of a section's queries concurrently and format the aggregated
+    content into the final section text. The finished section is saved in
+    llm_cache and put on `queue` for the writer as soon as it is ready.
+    """
+    cache_key = _section_cache_key(research_prompt, section)
+    saved = await asyncio.to_thread(llm_cache.get, cache_key)
+    if saved is not None:
+        print(f"\n--- Reusing saved section: {section} ---")
+        await queue.put((section, saved))
+        return saved
+    print(f"\n--- Processing section: {section} ---")
+    tasks = []
+    for q in queries:
+        full_query = f"{research_prompt} {q}"
+        print(f"Scraping for query: '{full_query}'")
+        tasks.append(combined_scrape_async(
+            session, scrape_limiter, parse_pool, url_cache, search_lock, full_query, num_urls=3
+        ))
+    results = await asyncio.gather(*tasks)
+    aggregated_text = "".join(part for parts in results for part in parts)
+    has_content = any(parts != [NO_CONTENT_TEXT] for parts in results)
+    print(f"Aggregated raw content length for {section}: {len(aggregated_text)}")
+    formatted_section = await format_text_with_ai_async(
+        aggregated_text, SECTION_CHAR_LIMIT, CLAUDE_API_KEY, claude_semaphore
+    )
+    # Don't save a section built from no scraped content, or one where
+    # format_text_with_ai failed and returned its input unchanged, so a rerun
+    # retries it.
+    worth_saving = has_content and formatted_section != aggregated_text
+    # The formatting prompt already asks for the length limit; only make a
+    # follow-up call if Claude overshot it.
+    if len(formatted_section) > SECTION_CHAR_LIMIT:
+        formatted_section = await ensure_length_limit_async(
+            formatted_section, SECTION_CHAR_LIMIT, CLAUDE_API_KEY, claude_semaphore
+        )
+    if worth_saving:
+        await asyncio.to_thread(llm_cache.set, cache_key, formatted_section, ttl=SECTION_CACHE_TTL)
+    await queue.put((section, formatted_section))
+    return formatted_section
+
+async def write_sections_in_order(queue, sections, f):
+    """
+    Take finished (section, text) pairs from `queue` in whatever order they
+    complete and write them to `f` in the order of `sections`, flushing after
+    each one so completed work is on disk while later sections are still running.
+    """
+    order = list(sections)
+    pending = {}
+    next_index = 0
+    while next_index < len(order):
+        section, content = await queue.get()
+        pending[section] = content
+        while next_index < len(order) and order[next_index] in pending:
+            name = order[next_index]
+            f.write(f"{name}:\n{pending.pop(name)}\n\n" + "="*80 + "\n\n")
+            f.flush()
+            next_index += 1
+
+async def process_sections(sections, research_prompt, f):
+    """
+    Generate the search queries for all sections in one Claude call, then process
+    every section concurrently over a single aiohttp session, writing each one
+    to `f` (in section order) as soon as it and the sections before it are done.
+    Returns a dict of section name to section text, in the order of `sections`.
+    """
+    # Cap connections per host so we stay polite to remote hosts.
+    connector = aiohttp.TCPConnector(limit=SCRAPE_CONCURRENCY, limit_per_host=5, ssl=False)
+    # Limit how many pages are fetched at once; shrinks under memory or CPU pressure.
+    scrape_limiter = AdaptiveLimiter(SCRAPE_CONCURRENCY, SCRAPE_MIN_CONCURRENCY)
+    # Memo of (url, selector) -> fetch task, so the same page surfacing under
+    # several queries or sections is only fetched once per run.
+    url_cache = {}
+    # Serialises the googlesearch fallback, which Google rate-limits per IP.
+    search_lock = asyncio.Lock()
+    # Limit concurrent Claude calls to respect API rate limits.
+    claude_semaphore = asyncio.Semaphore(3)
+    all_queries = await generate_all_queries_async(research_prompt, sections, CLAUDE_API_KEY, claude_semaphore)
+    queue = asyncio.Queue()
+    writer = asyncio.create_task(write_sections_in_order(queue, sections, f))
+    throttle = asyncio.create_task(scrape_limiter.run())
+    parse_pool = ProcessPoolExecutor(
+        max_workers=os.cpu_count(), mp_context=multiprocessing.get_context(PARSE_START_METHOD)
+    )
+    try:
+        async with aiohttp.ClientSession(connector=connector) as session:
+            results = await asyncio.gather(*[
+                process_section(
+                    session, scrape_limiter, parse_pool, url_cache, search_lock, claude_semaphore,
+                    section, all_queries[section], research_prompt, queue
+                )
+                for section in sections
+            ])
+        await writer
+        # The paper is fully written, so a rerun should regenerate every section.
+        for section in sections:
+            await asyncio.to_thread(llm_cache.delete, _section_cache_key(research_prompt, section))
+    except BrokenProcessPool:
+        # A parse worker died (e.g. out of memory); stop rather than quietly
+        # scraping nothing. Sections finished so far stay saved for a rerun.
+        print("Error: an HTML parsing worker died; aborting this run.")
+        raise
+    finally:
+        throttle.cancel()
+        writer.cancel()
+        # shutdown() blocks until workers exit, so keep it off the event loop.
+        await asyncio.to_thread(parse_pool.shutdown, cancel_futures=True)
+    return dict(zip(sections, results))
+
 def main():
     # Accept a research prompt from the user.
     if len(sys.argv) > 1:
@@ -219,34 +573,11 @@ def main():
         "Conclusion": "Summarize the research, discuss limitations, and suggest future directions."
     }
     
-    final_results = {}
-    
-    # For each section, generate diverse search queries, scrape content, and format it.
-    for section, desc in sections.items():
-        print(f"\n--- Processing section: {section} ---")
-        queries = generate_search_queries(section, research_prompt, CLAUDE_API_KEY)
-        aggregated_text = ""
-        for q in queries:
-            full_query = f"{research_prompt} {q}"
-            print(f"Scraping for query: '{full_query}'")
-            aggregated_text += combined_scrape(full_query, num_urls=3)
-            aggregated_text += "\n"
-            time.sleep(1)
-        print(f"Aggregated raw content length for {section}: {len(aggregated_text)}")
-        formatted_section = format_text_with_ai(aggregated_text, CLAUDE_API_KEY)
-        # Ensure each section's output does not exceed 50,000 characters.
-        limited_section = ensure_length_limit(formatted_section, 50000, CLAUDE_API_KEY)
-        final_results[section] = limited_section
-        time.sleep(2)
-    
-    # Combine all sections into a single research paper.
-    research_paper = ""
-    for section, content in final_results.items():
-        research_paper += f"{section}:\n{content}\n\n" + "="*80 + "\n\n"
-    
+    # Generate queries, scrape content, and format every section concurrently,
+    # writing each section to the output file as soon as it is ready.
     output_filename = "resrach_paper_beta_1.txt"
     with open(output_filename, "w", encoding="utf-8") as f:
-        f.write(research_paper)
+        asyncio.run(process_sections(sections, research_prompt, f))
     
     print(f"\nResearch paper generated and stored in '{output_filename}'.")
 
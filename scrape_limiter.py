@@ -0,0 +1,65 @@
+import os
+import asyncio
+import psutil
+
+MEMORY_PRESSURE_PERCENT = 85
+# One-minute load average per CPU above which we consider the machine busy.
+CPU_PRESSURE_LOAD = 1.5
+PRESSURE_SAMPLE_INTERVAL = 2
+
+def under_pressure():
+    """
+    Return True if system memory use or CPU load is above the pressure thresholds.
+    """
+    if psutil.virtual_memory().percent >= MEMORY_PRESSURE_PERCENT:
+        return True
+    try:
+        load = os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        # getloadavg is not available on Windows.
+        return False
+    return load >= CPU_PRESSURE_LOAD
+
+class AdaptiveLimiter:
+    """
+    Async context manager that bounds how many fetches run at once.
+    The limit is checked each time a fetch is admitted, so lowering it takes
+    effect immediately for every task still waiting, not just for new ones.
+    Call run() as a background task to resize the limit under pressure.
+    """
+
+    def __init__(self, max_concurrency, min_concurrency, pressure_check=under_pressure,
+                 interval=PRESSURE_SAMPLE_INTERVAL):
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = max_concurrency
+        self.active = 0
+        self._pressure_check = pressure_check
+        self._interval = interval
+        self._condition = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        async with self._condition:
+            self.active -= 1
+            self._condition.notify()
+
+    async def run(self):
+        """
+        Sample pressure every `interval` seconds. Under pressure, halve the limit
+        (down to min_concurrency); otherwise raise it by one (up to max_concurrency).
+        Runs until cancelled.
+        """
+        while True:
+            await asyncio.sleep(self._interval)
+            if self._pressure_check():
+                self.limit = max(self.min_concurrency, self.limit // 2)
+            elif self.limit < self.max_concurrency:
+                async with self._condition:
+                    self.limit += 1
+                    self._condition.notify()
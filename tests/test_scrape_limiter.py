@@ -0,0 +1,62 @@
+import os
+import sys
+import asyncio
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scrape_limiter import AdaptiveLimiter
+
+async def _run_jobs(limiter, num_jobs, duration):
+    """
+    Queue num_jobs jobs on the limiter at once and return the number of jobs
+    running (including itself) when each one was admitted, in admission order.
+    """
+    admitted = []
+
+    async def job():
+        async with limiter:
+            admitted.append(limiter.active)
+            await asyncio.sleep(duration)
+
+    throttle = asyncio.create_task(limiter.run())
+    try:
+        await asyncio.gather(*[job() for _ in range(num_jobs)])
+    finally:
+        throttle.cancel()
+    return admitted
+
+class AdaptiveLimiterTest(unittest.TestCase):
+    def test_concurrency_drops_for_already_queued_jobs_under_pressure(self):
+        limiter = AdaptiveLimiter(10, 2, pressure_check=lambda: True, interval=0.01)
+        admitted = asyncio.run(_run_jobs(limiter, 30, 0.1))
+        # The first 10 start before the first sample; everything queued behind
+        # them must be admitted at the reduced limit.
+        self.assertEqual(max(admitted[:10]), 10)
+        self.assertLessEqual(max(admitted[10:]), 2)
+        self.assertEqual(limiter.limit, 2)
+
+    def test_full_concurrency_without_pressure(self):
+        limiter = AdaptiveLimiter(10, 2, pressure_check=lambda: False, interval=0.01)
+        admitted = asyncio.run(_run_jobs(limiter, 30, 0.1))
+        self.assertEqual(max(admitted[10:]), 10)
+        self.assertEqual(limiter.limit, 10)
+
+    def test_limit_recovers_when_pressure_clears(self):
+        samples = iter([True, True, True])
+
+        async def scenario():
+            limiter = AdaptiveLimiter(8, 2, pressure_check=lambda: next(samples, False), interval=0.01)
+            throttle = asyncio.create_task(limiter.run())
+            await asyncio.sleep(0.035)
+            low = limiter.limit
+            await asyncio.sleep(0.2)
+            throttle.cancel()
+            return low, limiter.limit
+
+        low, recovered = asyncio.run(scenario())
+        self.assertEqual(low, 2)
+        self.assertEqual(recovered, 8)
+
+if __name__ == "__main__":
+    unittest.main()